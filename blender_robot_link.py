@@ -1,8 +1,11 @@
 import bpy
 import json
+import re
+import struct
 import threading
+import multiprocessing
+from multiprocessing import shared_memory
 import mathutils
-from math import radians
 import sys
 import subprocess
 import os
@@ -50,16 +53,51 @@ def install_pyserial():
     else:
         print("CRITICAL: Manual install required via terminal.")
 
-install_pyserial()
+# Sentinel in Blender's config dir: once pyserial has imported cleanly we
+# never pay for the installer's ensurepip/pip probing again on later loads.
+_SENTINEL = os.path.join(bpy.utils.user_resource('CONFIG'), ".pyserial_ok")
+
+if not os.path.exists(_SENTINEL):
+    install_pyserial()
 
 try:
     import serial
 except ImportError:
     raise ImportError("Library installed but not loaded. PLEASE RESTART BLENDER.")
 
+if not os.path.exists(_SENTINEL):
+    try:
+        open(_SENTINEL, "w").close()
+    except OSError:
+        pass
+
+# --- OPTIONAL FAST JSON ---
+# orjson parses small packets in native code and accepts raw bytes,
+# so we can skip the per-line decode(). Falls back to stdlib json.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# The ESP32 always sends the exact same shape: {"id":N,"q":[w,x,y,z]}
+# A precompiled regex extracts the five numbers far cheaper than a full
+# JSON parse. Anything that doesn't match falls back to _json_loads.
+_PKT = re.compile(rb'\{"id":(\d+),"q":\[([-\d.eE]+),([-\d.eE]+),([-\d.eE]+),([-\d.eE]+)\]\}')
+
+# Optional binary framing the firmware can switch to: a 0xAA sync byte,
+# a <Bffff> payload (id + quaternion) and a 0xAA 0x55 end sync. 20 bytes
+# per packet, no JSON and no float-to-text round trip. The reader accepts
+# both framings, so old JSON firmware keeps working.
+_FRAME_SYNC = 0xAA
+_FRAME_STRUCT = struct.Struct('<Bffff')
+_FRAME_SIZE = 1 + _FRAME_STRUCT.size + 2  # 20 bytes
+
 # --- CONFIGURATION ---
 SERIAL_PORT = 'COM3'    # <--- CONFIRM THIS IS STILL COM3
 BAUD_RATE = 921600      # Matches ESP32
+MAX_BACKLOG_BYTES = 512  # Newest bytes kept after a stall (~8 packets/sensor)
+DEBUG = False           # Rx stats print; stdout can stall the reader at 921600
 
 # --- BONE MAPPING (UPDATED) ---
 BONE_MAP = {
@@ -74,75 +112,219 @@ BONE_OFFSETS = {
     1: mathutils.Euler((0, 0, 0), 'XYZ')
 }
 
-latest_data = {} 
+# Offsets are constant, so convert them to quaternion tuples once here
+# instead of calling to_quaternion() on every frame.
+BONE_OFFSET_QUATS = {k: tuple(v.to_quaternion()) for k, v in BONE_OFFSETS.items()}
+
+NUM_SENSORS = 2
+
+# --- SHARED STATE (reader -> modal) ---
+# One record per sensor in a shared-memory block: a version counter plus
+# the quaternion. This works unchanged whether the reader is a thread or
+# (on OSes with fork) a separate process that never touches Blender's GIL.
+# The version counter doubles as a seqlock: it is odd while the record is
+# being written, so the modal can detect and discard a torn quaternion.
+# Version 0 = nothing received yet. The final byte is a run flag the
+# reader polls, so cancel works across the process boundary too.
+# Precompiled Structs: pack/unpack jump straight into C without
+# re-parsing a format string on every packet. The records themselves are
+# contiguous unboxed floats - no PyFloat or list is created per packet.
+_REC_VER = struct.Struct('<I')
+_REC_QUAT = struct.Struct('<4f')
+_REC_SIZE = _REC_VER.size + _REC_QUAT.size  # 20 bytes
+_SHM_SIZE = NUM_SENSORS * _REC_SIZE + 1
+_RUN_FLAG = _SHM_SIZE - 1
+
+_shm = None
 is_running = False
 packet_count = 0
+_ser = None
+
+def _store_quat(buf, sid, w, x, y, z):
+    if not 0 <= sid < NUM_SENSORS:
+        return
+    off = sid * _REC_SIZE
+    ver = _REC_VER.unpack_from(buf, off)[0]
+    _REC_VER.pack_into(buf, off, ver + 1)          # odd = mid-write
+    # Standard MPU to Blender axis mapping, folded in once per packet
+    # instead of once per rendered frame.
+    # If twisting occurs, try: (w, x, z, -y) or (w, -y, x, z)
+    _REC_QUAT.pack_into(buf, off + 4, w, y, x, -z)
+    _REC_VER.pack_into(buf, off, ver + 2)          # even = stable
+
+def _load_quat(sensor_id, last_ver):
+    # Returns (version, quat) or (last_ver, None) when there is nothing
+    # new or the writer was caught mid-write (retry next tick).
+    buf = _shm.buf
+    off = sensor_id * _REC_SIZE
+    ver = _REC_VER.unpack_from(buf, off)[0]
+    if ver == 0 or ver & 1 or ver == last_ver:
+        return last_ver, None
+    quat = _REC_QUAT.unpack_from(buf, off + 4)
+    if _REC_VER.unpack_from(buf, off)[0] != ver:
+        return last_ver, None
+    return ver, quat
 
-def read_serial_thread():
-    global is_running, latest_data, packet_count
+def read_serial_loop():
+    global is_running, packet_count, _ser
+    buf = _shm.buf
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.01)
+        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1.0)
+        try:
+            # Windows only: a ~128K driver RX buffer rides out GC pauses
+            # and Blender frame stutters without dropping bytes.
+            ser.set_buffer_size(rx_size=131072, tx_size=4096)
+        except AttributeError:
+            pass  # not available on this platform
+        _ser = ser
         print(f"SUCCESS: Connected to {SERIAL_PORT}")
-        while is_running:
-            if ser.in_waiting:
-                try:
-                    line = ser.readline().decode('utf-8').strip()
-                    if line.startswith('{') and line.endswith('}'):
-                        data = json.loads(line)
-                        if "id" in data and "q" in data:
-                            latest_data[data["id"]] = data["q"]
-                            packet_count += 1
-                            if packet_count % 100 == 0:
-                                print(f"DEBUG: Rx Data ID:{data['id']} (Total: {packet_count})")
-                except:
-                    pass
+        # Preallocated receive buffer: bytes are read straight into it and
+        # the regex matches in place, so the steady-state hot path makes no
+        # bytes/str temporaries at all (the JSON fallback still slices).
+        rxbuf = bytearray(65536)
+        rxlen = 0
+        while buf[_RUN_FLAG]:
+            try:
+                # Block in the OS read until data arrives (zero CPU when
+                # idle), then drain whatever is waiting in ONE readinto.
+                want = ser.in_waiting or 1
+                free = len(rxbuf) - rxlen
+                if want > free:
+                    want = free
+                n = ser.readinto(memoryview(rxbuf)[rxlen:rxlen + want])
+            except serial.SerialException:
+                break  # port gone or cancel_read() during shutdown
+            if not n:
+                continue  # timeout - recheck the run flag
+            rxlen += n
+            # The TIMER only ever consumes the newest sample per sensor, so
+            # after a stall skip straight to the freshest bytes instead of
+            # parsing packets that would be overwritten anyway; the framing
+            # checks below resync past the partial leading packet.
+            if rxlen > MAX_BACKLOG_BYTES:
+                drop = rxlen - MAX_BACKLOG_BYTES
+                rxbuf[:MAX_BACKLOG_BYTES] = rxbuf[drop:rxlen]
+                rxlen = MAX_BACKLOG_BYTES
+            pos = 0
+            while pos < rxlen:
+                sid = None
+                if rxbuf[pos] == _FRAME_SYNC:
+                    # Binary frame: fixed 20 bytes, one unpack, no text
+                    if rxlen - pos < _FRAME_SIZE:
+                        break  # rest of the frame arrives next read
+                    if (rxbuf[pos + _FRAME_SIZE - 2] == 0xAA
+                            and rxbuf[pos + _FRAME_SIZE - 1] == 0x55):
+                        sid, w, x, y, z = _FRAME_STRUCT.unpack_from(rxbuf, pos + 1)
+                        _store_quat(buf, sid, w, x, y, z)
+                        pos += _FRAME_SIZE
+                    else:
+                        pos += 1  # false sync, resync on the next byte
+                else:
+                    nl = rxbuf.find(b'\n', pos, rxlen)
+                    if nl < 0:
+                        break  # partial line, finished next read
+                    try:
+                        m = _PKT.match(rxbuf, pos, nl)
+                        if m:
+                            sid = int(m.group(1))
+                            _store_quat(buf, sid,
+                                        float(m.group(2)), float(m.group(3)),
+                                        float(m.group(4)), float(m.group(5)))
+                        else:
+                            line = bytes(rxbuf[pos:nl]).strip()
+                            # Indexed byte compares (0x7B='{' 0x7D='}') are a
+                            # single C slot access each, vs two method calls
+                            if len(line) >= 12 and line[0] == 0x7B and line[-1] == 0x7D:
+                                data = _json_loads(line)
+                                if "id" in data and "q" in data:
+                                    sid = data["id"]
+                                    q = data["q"]
+                                    _store_quat(buf, sid, q[0], q[1], q[2], q[3])
+                    except:
+                        pass
+                    pos = nl + 1
+                if sid is not None:
+                    packet_count += 1
+                    # bitwise & is cheaper than % in the eval loop, and
+                    # the constant flag keeps the print out of production
+                    if DEBUG and (packet_count & 1023) == 0:
+                        print(f"DEBUG: Rx Data ID:{sid} (Total: {packet_count})")
+            # Slide the unconsumed tail to the front of the buffer in place
+            tail = rxlen - pos
+            if pos and tail:
+                rxbuf[:tail] = rxbuf[pos:rxlen]
+            rxlen = tail
         ser.close()
     except Exception as e:
         print(f"Serial Error: {e}")
         is_running = False
+    _ser = None
 
 class RobotMocapOperator(bpy.types.Operator):
     bl_idname = "wm.robot_mocap"
     bl_label = "Start Robot Link"
-    _timer = None
+    _tick_fn = None
     _armature_name = ""
+    _last_ver = None
+    _warned = None
+    _worker = None
 
     def modal(self, context, event):
+        # Bone updates run in the bpy.app.timers callback below; the modal
+        # only exists so ESC still tears everything down.
         if event.type == 'ESC':
             return self.cancel(context)
+        return {'PASS_THROUGH'}
 
-        if event.type == 'TIMER':
-            # Use the armature found during execute, or try to find it again
-            obj = bpy.data.objects.get(self._armature_name)
-            
-            if obj:
-                for sensor_id, bone_name in BONE_MAP.items():
-                    if sensor_id in latest_data:
-                        p_bone = obj.pose.bones.get(bone_name)
-                        if p_bone:
-                            # 1. Get Sensor Rotation
-                            w, x, y, z = latest_data[sensor_id]
-                            
-                            # Standard MPU to Blender mapping
-                            # If twisting occurs, try: (w, x, z, -y) or (w, -y, x, z)
-                            sensor_quat = mathutils.Quaternion((w, y, x, -z)) 
-                            
-                            # 2. Apply Offset
-                            offset = BONE_OFFSETS.get(sensor_id, mathutils.Euler((0,0,0)))
-                            final_rot = sensor_quat @ offset.to_quaternion()
-                            
-                            # 3. Apply to Bone
-                            p_bone.rotation_mode = 'QUATERNION'
-                            p_bone.rotation_quaternion = final_rot
-                        else:
-                            # Debug: Print once if bone missing
-                            if packet_count < 5: 
-                                print(f"WARNING: Bone '{bone_name}' not found in Armature!")
+    def _tick(self):
+        # bpy.app.timers callback: the return value is the delay until the
+        # next call, so fresh data is serviced fast while holding still
+        # backs the timer off and skips the bone writes (and the depsgraph
+        # evaluation they would trigger) entirely.
+        if not is_running:
+            return None  # stops the timer
+        obj = bpy.data.objects.get(self._armature_name)
+        if not obj:
+            print(f"CRITICAL: Armature '{self._armature_name}' not found!")
+            # Full teardown, like the old modal did: otherwise the reader,
+            # the open port and the shared memory would linger until ESC.
+            self.cancel(None)
+            return None
+        updated = False
+        for sensor_id, bone_name in BONE_MAP.items():
+            # Skip untouched sensors: same version = nothing new
+            # arrived since the last tick, so the bone is already
+            # posed correctly and nothing needs recomputing.
+            ver, quat = _load_quat(sensor_id, self._last_ver.get(sensor_id, 0))
+            if quat is None:
+                continue
+            p_bone = obj.pose.bones.get(bone_name)
+            if p_bone:
+                self._last_ver[sensor_id] = ver
+                updated = True
+                # 1. Get Sensor Rotation - already in Blender axes, the
+                # MPU mapping is applied at ingest (see _store_quat)
+                sw, sx, sy, sz = quat
+
+                # 2+3. Apply Offset and write the result straight into
+                # the bone: the Hamilton product against the precomputed
+                # offset tuple is written out by hand, so no Quaternion
+                # or Euler objects are allocated per frame.
+                ow, ox, oy, oz = BONE_OFFSET_QUATS.get(sensor_id, (1.0, 0.0, 0.0, 0.0))
+                p_bone.rotation_mode = 'QUATERNION'
+                p_bone.rotation_quaternion[:] = (
+                    sw*ow - sx*ox - sy*oy - sz*oz,
+                    sw*ox + sx*ow + sy*oz - sz*oy,
+                    sw*oy - sx*oz + sy*ow + sz*ox,
+                    sw*oz + sx*oy - sy*ox + sz*ow)
             else:
-                 print(f"CRITICAL: Armature '{self._armature_name}' not found!")
-                 return self.cancel(context)
-                 
-        return {'PASS_THROUGH'}
+                # Debug: Print once if bone missing
+                # (packet_count lives in the reader process, so a
+                # local set is used to de-duplicate the warning)
+                if bone_name not in self._warned:
+                    self._warned.add(bone_name)
+                    print(f"WARNING: Bone '{bone_name}' not found in Armature!")
+        return 0.008 if updated else 0.032
 
     def execute(self, context):
         global is_running
@@ -164,20 +346,55 @@ class RobotMocapOperator(bpy.types.Operator):
                     self.report({'ERROR'}, "Please SELECT your Robot Armature first!")
                     return {'CANCELLED'}
 
+            global _shm
+            _shm = shared_memory.SharedMemory(create=True, size=_SHM_SIZE)
+            _shm.buf[_RUN_FLAG] = 1
             is_running = True
-            t = threading.Thread(target=read_serial_thread, daemon=True)
-            t.start()
-            wm = context.window_manager
-            self._timer = wm.event_timer_add(0.016, window=context.window)
-            wm.modal_handler_add(self)
+            self._last_ver = {}
+            self._warned = set()
+            # On OSes with fork the parser runs in its own process and never
+            # competes with Blender for the GIL. Windows uses spawn, which
+            # would re-import this script without bpy, so there the reader
+            # stays on a daemon thread (same code path, same shared memory).
+            if multiprocessing.get_start_method() == 'fork':
+                self._worker = multiprocessing.Process(target=read_serial_loop, daemon=True)
+            else:
+                self._worker = threading.Thread(target=read_serial_loop, daemon=True)
+            self._worker.start()
+            # Bound methods are recreated on each access; keep one reference
+            # so the exact same callable can be unregistered in cancel().
+            self._tick_fn = self._tick
+            bpy.app.timers.register(self._tick_fn, first_interval=0.016)
+            context.window_manager.modal_handler_add(self)
             self.report({'INFO'}, f"Robot Link Started on {SERIAL_PORT}")
         return {'RUNNING_MODAL'}
 
     def cancel(self, context):
-        global is_running
+        global is_running, _shm
         is_running = False
-        wm = context.window_manager
-        wm.event_timer_remove(self._timer)
+        if _shm is not None:
+            _shm.buf[_RUN_FLAG] = 0  # stops the reader, thread or process
+        if _ser is not None:
+            try:
+                _ser.cancel_read()  # interrupt the blocking read immediately
+            except Exception:
+                pass
+        if self._worker is not None:
+            self._worker.join(timeout=2.0)
+            self._worker = None
+        if _shm is not None:
+            _shm.close()
+            try:
+                _shm.unlink()
+            except FileNotFoundError:
+                pass
+            _shm = None
+        if self._tick_fn is not None:
+            try:
+                bpy.app.timers.unregister(self._tick_fn)
+            except ValueError:
+                pass  # already stopped itself by returning None
+            self._tick_fn = None
         print("Stopped.")
         return {'CANCELLED'}
 
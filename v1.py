@@ -1,9 +1,12 @@
 
 import bpy
 import json
+import re
+import struct
 import threading
-import mathutils
-from math import degrees, radians
+import multiprocessing
+from multiprocessing import shared_memory
+from math import degrees, radians, atan2, asin
 import sys
 import subprocess
 import os
@@ -51,16 +54,50 @@ def install_pyserial():
     else:
         print("CRITICAL: Manual install required via terminal.")
 
-install_pyserial()
+# Sentinel in Blender's config dir: once pyserial has imported cleanly we
+# never pay for the installer's ensurepip/pip probing again on later loads.
+_SENTINEL = os.path.join(bpy.utils.user_resource('CONFIG'), ".pyserial_ok")
+
+if not os.path.exists(_SENTINEL):
+    install_pyserial()
 
 try:
     import serial
 except ImportError:
     raise ImportError("Library installed but not loaded. PLEASE RESTART BLENDER.")
 
+if not os.path.exists(_SENTINEL):
+    try:
+        open(_SENTINEL, "w").close()
+    except OSError:
+        pass
+
+# --- OPTIONAL FAST JSON ---
+# orjson parses small packets in native code and accepts raw bytes,
+# so we can skip the per-line decode(). Falls back to stdlib json.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# The ESP32 always sends the exact same shape: {"id":N,"q":[w,x,y,z]}
+# A precompiled regex extracts the five numbers far cheaper than a full
+# JSON parse. Anything that doesn't match falls back to _json_loads.
+_PKT = re.compile(rb'\{"id":(\d+),"q":\[([-\d.eE]+),([-\d.eE]+),([-\d.eE]+),([-\d.eE]+)\]\}')
+
+# Optional binary framing the firmware can switch to: a 0xAA sync byte,
+# a <Bffff> payload (id + quaternion) and a 0xAA 0x55 end sync. 20 bytes
+# per packet, no JSON and no float-to-text round trip. The reader accepts
+# both framings, so old JSON firmware keeps working.
+_FRAME_SYNC = 0xAA
+_FRAME_STRUCT = struct.Struct('<Bffff')
+_FRAME_SIZE = 1 + _FRAME_STRUCT.size + 2  # 20 bytes
+
 # --- CONFIGURATION ---
 SERIAL_PORT = 'COM3'    # CHECK YOUR ESP32 PORT
-BAUD_RATE = 921600      
+BAUD_RATE = 921600
+MAX_BACKLOG_BYTES = 512  # Newest bytes kept after a stall (~8 packets/sensor)
 
 # --- JOINT MAPPING (6 AXIS) ---
 # Enter the EXACT name of the bone for each joint
@@ -75,6 +112,10 @@ JOINT_MAP = {
 
 }
 
+# Slot order of the flat targets tuple returned by _quats_to_targets;
+# the bone loop indexes into it instead of hashing joint names.
+_TARGET_ORDER = ("Base", "Shoulder", "Elbow", "Wrist", "Wrist_2", "Gripper")
+
 # --- INITIAL / HOME POSE (Angles in Degrees) ---
 # When you press ESC, the robot will return to these angles.
 INITIAL_POSE = {
@@ -91,105 +132,223 @@ INITIAL_POSE = {
 IMU_SHOULDER_ID = 1  
 IMU_FOREARM_ID = 0   
 
-latest_data = {} 
+NUM_SENSORS = 2
+
+# --- SHARED STATE (reader -> modal) ---
+# One record per sensor in a shared-memory block: a version counter plus
+# the quaternion. This works unchanged whether the reader is a thread or
+# (on OSes with fork) a separate process that never touches Blender's GIL.
+# The version counter doubles as a seqlock: it is odd while the record is
+# being written, so the modal can detect and discard a torn quaternion.
+# Version 0 = nothing received yet. The final byte is a run flag the
+# reader polls, so cancel works across the process boundary too.
+# Precompiled Structs: pack/unpack jump straight into C without
+# re-parsing a format string on every packet. The records themselves are
+# contiguous unboxed floats - no PyFloat or list is created per packet.
+_REC_VER = struct.Struct('<I')
+_REC_QUAT = struct.Struct('<4f')
+_REC_SIZE = _REC_VER.size + _REC_QUAT.size  # 20 bytes
+_SHM_SIZE = NUM_SENSORS * _REC_SIZE + 1
+_RUN_FLAG = _SHM_SIZE - 1
+
+_shm = None
 is_running = False
 packet_count = 0
+_ser = None
+
+def _store_quat(buf, sid, w, x, y, z):
+    if not 0 <= sid < NUM_SENSORS:
+        return
+    off = sid * _REC_SIZE
+    ver = _REC_VER.unpack_from(buf, off)[0]
+    _REC_VER.pack_into(buf, off, ver + 1)          # odd = mid-write
+    _REC_QUAT.pack_into(buf, off + 4, w, x, y, z)
+    _REC_VER.pack_into(buf, off, ver + 2)          # even = stable
 
-def read_serial_thread():
-    global is_running, latest_data, packet_count
+def _load_quat(sensor_id, last_ver):
+    # Returns (version, quat) or (last_ver, None) when there is nothing
+    # new or the writer was caught mid-write (retry next tick).
+    buf = _shm.buf
+    off = sensor_id * _REC_SIZE
+    ver = _REC_VER.unpack_from(buf, off)[0]
+    if ver == 0 or ver & 1 or ver == last_ver:
+        return last_ver, None
+    quat = _REC_QUAT.unpack_from(buf, off + 4)
+    if _REC_VER.unpack_from(buf, off)[0] != ver:
+        return last_ver, None
+    return ver, quat
+
+def read_serial_loop():
+    global is_running, packet_count, _ser
+    buf = _shm.buf
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.01)
+        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1.0)
+        try:
+            # Windows only: a ~128K driver RX buffer rides out GC pauses
+            # and Blender frame stutters without dropping bytes.
+            ser.set_buffer_size(rx_size=131072, tx_size=4096)
+        except AttributeError:
+            pass  # not available on this platform
+        _ser = ser
         print(f"SUCCESS: Connected to {SERIAL_PORT}")
-        while is_running:
-            if ser.in_waiting:
+        # Preallocated receive buffer: bytes are read straight into it and
+        # the regex matches in place, so the steady-state hot path makes no
+        # bytes/str temporaries at all (the JSON fallback still slices).
+        rxbuf = bytearray(65536)
+        rxlen = 0
+        while buf[_RUN_FLAG]:
+            try:
+                # Block in the OS read until data arrives (zero CPU when
+                # idle), then drain whatever is waiting in ONE readinto.
+                want = ser.in_waiting or 1
+                free = len(rxbuf) - rxlen
+                if want > free:
+                    want = free
+                n = ser.readinto(memoryview(rxbuf)[rxlen:rxlen + want])
+            except serial.SerialException:
+                break  # port gone or cancel_read() during shutdown
+            if not n:
+                continue  # timeout - recheck the run flag
+            rxlen += n
+            # The TIMER only ever consumes the newest sample per sensor, so
+            # after a stall skip straight to the freshest bytes instead of
+            # parsing packets that would be overwritten anyway; the framing
+            # checks below resync past the partial leading packet.
+            if rxlen > MAX_BACKLOG_BYTES:
+                drop = rxlen - MAX_BACKLOG_BYTES
+                rxbuf[:MAX_BACKLOG_BYTES] = rxbuf[drop:rxlen]
+                rxlen = MAX_BACKLOG_BYTES
+            pos = 0
+            while pos < rxlen:
+                if rxbuf[pos] == _FRAME_SYNC:
+                    # Binary frame: fixed 20 bytes, one unpack, no text
+                    if rxlen - pos < _FRAME_SIZE:
+                        break  # rest of the frame arrives next read
+                    if (rxbuf[pos + _FRAME_SIZE - 2] == 0xAA
+                            and rxbuf[pos + _FRAME_SIZE - 1] == 0x55):
+                        sid, w, x, y, z = _FRAME_STRUCT.unpack_from(rxbuf, pos + 1)
+                        _store_quat(buf, sid, w, x, y, z)
+                        packet_count += 1
+                        pos += _FRAME_SIZE
+                    else:
+                        pos += 1  # false sync, resync on the next byte
+                    continue
+                nl = rxbuf.find(b'\n', pos, rxlen)
+                if nl < 0:
+                    break  # partial line, finished next read
                 try:
-                    line = ser.readline().decode('utf-8').strip()
-                    if line.startswith('{') and line.endswith('}'):
-                        data = json.loads(line)
-                        if "id" in data and "q" in data:
-                            latest_data[data["id"]] = data["q"]
-                            packet_count += 1
+                    m = _PKT.match(rxbuf, pos, nl)
+                    if m:
+                        _store_quat(buf, int(m.group(1)),
+                                    float(m.group(2)), float(m.group(3)),
+                                    float(m.group(4)), float(m.group(5)))
+                        packet_count += 1
+                    else:
+                        line = bytes(rxbuf[pos:nl]).strip()
+                        # Indexed byte compares (0x7B='{' 0x7D='}') are a
+                        # single C slot access each, vs two method calls
+                        if len(line) >= 12 and line[0] == 0x7B and line[-1] == 0x7D:
+                            data = _json_loads(line)
+                            if "id" in data and "q" in data:
+                                q = data["q"]
+                                _store_quat(buf, data["id"], q[0], q[1], q[2], q[3])
+                                packet_count += 1
                 except:
                     pass
+                pos = nl + 1
+            # Slide the unconsumed tail to the front of the buffer in place
+            tail = rxlen - pos
+            if pos and tail:
+                rxbuf[:tail] = rxbuf[pos:rxlen]
+            rxlen = tail
         ser.close()
     except Exception as e:
         print(f"Serial Error: {e}")
         is_running = False
+    _ser = None
+
+def _quats_to_targets(q1, q2):
+    # Fused conversion: extracts the ZYX euler angles of both IMUs and
+    # applies the 6-axis logic table in one call, using plain math instead
+    # of building two mathutils.Quaternion objects + two to_euler('ZYX')
+    # calls per frame. Blender's 'ZYX' applies Z first (R = Rx*Ry*Rz),
+    # which these formulas invert - note the cross-term signs differ from
+    # the aerospace zyx convention.
+    # Assumes: Z=Yaw, Y=Pitch, X=Roll. Adjust here if your axes differ!
+    w, x, y, z = q1  # IMU 1 (Shoulder)
+    imu1_roll = atan2(2.0 * (w * x - y * z), 1.0 - 2.0 * (x * x + y * y))
+    s = 2.0 * (w * y + x * z)
+    if s > 1.0: s = 1.0
+    elif s < -1.0: s = -1.0
+    imu1_pitch = asin(s)
+    imu1_yaw = atan2(2.0 * (w * z - x * y), 1.0 - 2.0 * (y * y + z * z))
+
+    w, x, y, z = q2  # IMU 2 (Forearm)
+    imu2_roll = atan2(2.0 * (w * x - y * z), 1.0 - 2.0 * (x * x + y * y))
+    s = 2.0 * (w * y + x * z)
+    if s > 1.0: s = 1.0
+    elif s < -1.0: s = -1.0
+    imu2_pitch = asin(s)
+
+    # Logic Table, in _TARGET_ORDER slots:
+    return (imu1_yaw,                    # Base:     IMU1 Yaw
+            imu1_pitch,                  # Shoulder: IMU1 Pitch
+            imu2_pitch - imu1_pitch,     # Elbow:    IMU2 - IMU1 Pitch
+            imu2_roll - imu1_roll,       # Wrist:    IMU2 - IMU1 Roll
+            0.0,                         # Wrist_2:  New 6th Bone (Set logic here)
+            imu2_roll)                   # Gripper:  IMU2 Roll
 
 class RobotMocapOperator(bpy.types.Operator):
     bl_idname = "wm.robot_mocap"
     bl_label = "Start Robot Logic"
-    _timer = None
+    _tick_fn = None
     _armature_name = ""
+    _joints = []
+    _worker = None
 
     def modal(self, context, event):
+        # Bone updates run in the bpy.app.timers callback below; the modal
+        # only exists so ESC still tears everything down.
         if event.type == 'ESC':
             return self.cancel(context)
-
-        if event.type == 'TIMER':
-            obj = bpy.data.objects.get(self._armature_name)
-            
-            # Check if we have data from BOTH sensors
-            if obj and (IMU_SHOULDER_ID in latest_data) and (IMU_FOREARM_ID in latest_data):
-                
-                # 1. Get Quaternions
-                # IMU 1 (Shoulder)
-                q1_raw = latest_data[IMU_SHOULDER_ID]
-                q1 = mathutils.Quaternion((q1_raw[0], q1_raw[1], q1_raw[2], q1_raw[3]))
-                
-                # IMU 2 (Forearm)
-                q2_raw = latest_data[IMU_FOREARM_ID]
-                q2 = mathutils.Quaternion((q2_raw[0], q2_raw[1], q2_raw[2], q2_raw[3]))
-
-                # 2. Convert to Euler Angles (Radians)
-                # 'ZYX' usually maps to: Z=Yaw, Y=Pitch, X=Roll (depending on mounting)
-                # If your sensor is mounted sideways, you might need to swap these.
-                imu1_euler = q1.to_euler('ZYX')
-                imu2_euler = q2.to_euler('ZYX')
-
-                # Extract Logic Variables
-                # Assumes: Z=Yaw, Y=Pitch, X=Roll. 
-                # Adjust these variables if your axes are different!
-                imu1_yaw   = imu1_euler.z
-                imu1_pitch = imu1_euler.y
-                imu1_roll  = imu1_euler.x
-
-                imu2_pitch = imu2_euler.y
-                imu2_roll  = imu2_euler.x
-
-                # 3. Calculate Target Angles (The 6-Axis Logic)
-                target_angles = {}
-                
-                # Logic Table Implementation:
-                target_angles["Base"]     = imu1_yaw                        # IMU1 Yaw
-                target_angles["Shoulder"] = imu1_pitch                      # IMU1 Pitch
-                target_angles["Elbow"]    = imu2_pitch - imu1_pitch         # IMU2 - IMU1 Pitch
-                target_angles["Wrist"]    = imu2_roll - imu1_roll           # IMU2 - IMU1 Roll
-                target_angles["Wrist_2"]  = 0.0                             # New 6th Bone (Set logic here)
-                target_angles["Gripper"]  = imu2_roll                       # IMU2 Roll
-
-                # 4. Apply to Bones
-                for joint_name, config in JOINT_MAP.items():
-                    bone_name = config["bone"]
-                    axis = config["axis"]
-                    
-                    p_bone = obj.pose.bones.get(bone_name)
-                    if p_bone:
-                        # Set Rotation Mode to Euler for single-axis control
-                        p_bone.rotation_mode = 'XYZ'
-                        
-                        angle = target_angles[joint_name]
-
-                        # Apply angle to the specific axis
-                        if axis == 'X':
-                            p_bone.rotation_euler.x = angle
-                        elif axis == 'Y':
-                            p_bone.rotation_euler.y = angle
-                        elif axis == 'Z':
-                            p_bone.rotation_euler.z = angle
-            
         return {'PASS_THROUGH'}
 
+    def _tick(self):
+        # bpy.app.timers callback: the return value is the delay until the
+        # next call, so fresh data is serviced fast while holding still
+        # backs the timer off and skips the euler math, bone writes and the
+        # depsgraph evaluation they would trigger.
+        if not is_running:
+            return None  # stops the timer
+        obj = bpy.data.objects.get(self._armature_name)
+        if not obj:
+            # Keep retrying like the old modal did (the armature may be
+            # renamed back); killing the timer here would strand the reader
+            # and the shared memory with ESC as the only way out.
+            return 0.5
+
+        # 1. Get Quaternions (None when unchanged, torn, or not yet seen)
+        ver1, q1 = _load_quat(IMU_SHOULDER_ID, self._ver1)
+        ver2, q2 = _load_quat(IMU_FOREARM_ID, self._ver2)
+        if q1 is None and q2 is None:
+            return 0.032  # nothing moved since the last applied frame
+        if q1 is not None:
+            self._ver1, self._q1 = ver1, q1
+        if q2 is not None:
+            self._ver2, self._q2 = ver2, q2
+        if self._q1 is None or self._q2 is None:
+            return 0.032  # still waiting for the other sensor's first packet
+
+        # 2+3. Convert both quaternions and run the 6-axis logic
+        # table in ONE fused call (see _quats_to_targets above).
+        targets = _quats_to_targets(self._q1, self._q2)
+
+        # 4. Apply to Bones (resolved once in execute): straight tuple
+        # indexing, no dict build or joint-name hashing per frame
+        for p_bone, axis_idx, t_idx in self._joints:
+            p_bone.rotation_euler[axis_idx] = targets[t_idx]
+        return 0.008
+
     def execute(self, context):
         global is_running
         if not is_running:
@@ -204,21 +363,71 @@ class RobotMocapOperator(bpy.types.Operator):
                     self.report({'ERROR'}, "Select Armature first!")
                     return {'CANCELLED'}
 
+            # Resolve JOINT_MAP once: bone lookups, axis letters and the
+            # rotation mode are all settled here instead of every TIMER tick.
+            obj = bpy.data.objects.get(self._armature_name)
+            axis_index = {'X': 0, 'Y': 1, 'Z': 2}
+            self._joints = []
+            for joint_name, config in JOINT_MAP.items():
+                p_bone = obj.pose.bones.get(config["bone"])
+                if p_bone:
+                    # Set Rotation Mode to Euler for single-axis control
+                    p_bone.rotation_mode = 'XYZ'
+                    self._joints.append((p_bone, axis_index[config["axis"]],
+                                         _TARGET_ORDER.index(joint_name)))
+                else:
+                    print(f"WARNING: Bone '{config['bone']}' not found in Armature!")
+
+            global _shm
+            _shm = shared_memory.SharedMemory(create=True, size=_SHM_SIZE)
+            _shm.buf[_RUN_FLAG] = 1
             is_running = True
-            t = threading.Thread(target=read_serial_thread, daemon=True)
-            t.start()
-            wm = context.window_manager
-            self._timer = wm.event_timer_add(0.016, window=context.window)
-            wm.modal_handler_add(self)
+            # On OSes with fork the parser runs in its own process and never
+            # competes with Blender for the GIL. Windows uses spawn, which
+            # would re-import this script without bpy, so there the reader
+            # stays on a daemon thread (same code path, same shared memory).
+            if multiprocessing.get_start_method() == 'fork':
+                self._worker = multiprocessing.Process(target=read_serial_loop, daemon=True)
+            else:
+                self._worker = threading.Thread(target=read_serial_loop, daemon=True)
+            self._worker.start()
+            self._ver1 = self._ver2 = 0
+            self._q1 = self._q2 = None
+            # Bound methods are recreated on each access; keep one reference
+            # so the exact same callable can be unregistered in cancel().
+            self._tick_fn = self._tick
+            bpy.app.timers.register(self._tick_fn, first_interval=0.016)
+            context.window_manager.modal_handler_add(self)
             print("6-Axis Logic Started.")
         return {'RUNNING_MODAL'}
 
     def cancel(self, context):
-        global is_running
+        global is_running, _shm
         is_running = False
-        wm = context.window_manager
-        wm.event_timer_remove(self._timer)
-        
+        if _shm is not None:
+            _shm.buf[_RUN_FLAG] = 0  # stops the reader, thread or process
+        if _ser is not None:
+            try:
+                _ser.cancel_read()  # interrupt the blocking read immediately
+            except Exception:
+                pass
+        if self._worker is not None:
+            self._worker.join(timeout=2.0)
+            self._worker = None
+        if _shm is not None:
+            _shm.close()
+            try:
+                _shm.unlink()
+            except FileNotFoundError:
+                pass
+            _shm = None
+        if self._tick_fn is not None:
+            try:
+                bpy.app.timers.unregister(self._tick_fn)
+            except ValueError:
+                pass  # already stopped itself by returning None
+            self._tick_fn = None
+
         # --- RESET TO INITIAL POSE ---
         print("Resetting Robot to Home Position...")
         obj = bpy.data.objects.get(self._armature_name)